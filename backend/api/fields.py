@@ -0,0 +1,53 @@
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.fields import ImageField
+
+from foodgram.settings import (
+    RECIPE_IMAGE_MAX_PIXELS,
+    RECIPE_IMAGE_MAX_SIZE,
+    RECIPE_IMAGE_PIXELS_ERROR,
+    RECIPE_IMAGE_SIZE_ERROR,
+)
+
+
+def check_image_limits(file):
+    """Проверяет размер файла и число пикселей без декодирования.
+
+    Image.open читает только заголовок, поэтому проверка дешёвая и
+    выполняется до полной проверки изображения.
+    """
+    if file.size > RECIPE_IMAGE_MAX_SIZE:
+        raise serializers.ValidationError(
+            RECIPE_IMAGE_SIZE_ERROR.format(
+                size=RECIPE_IMAGE_MAX_SIZE // (1024 * 1024)
+            )
+        )
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+    except Exception:
+        # Некорректный файл отклонит проверка ImageField.
+        return
+    finally:
+        file.seek(0)
+    if width * height > RECIPE_IMAGE_MAX_PIXELS:
+        raise serializers.ValidationError(
+            RECIPE_IMAGE_PIXELS_ERROR.format(
+                pixels=RECIPE_IMAGE_MAX_PIXELS // 10 ** 6
+            )
+        )
+
+
+class RecipeImageField(Base64ImageField):
+    """Изображение в base64 или файлом из multipart-формы."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            check_image_limits(data)
+            return ImageField.to_internal_value(self, data)
+        file = super().to_internal_value(data)
+        if file is not None:
+            check_image_limits(file)
+        return file
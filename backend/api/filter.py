@@ -1,15 +1,17 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
 
-from recipes.models import Recipe, Ingredient
+from recipes.models import Recipe
+from .reference import tags_cache
 
 
-class IngredientSearchFilter(SearchFilter):
-    search_param = "name"
-
-    class Meta:
-        model = Ingredient
-        fields = ("name",)
+def get_tag_choices():
+    """Слаги тэгов из кеша справочника, без отдельного запроса к БД."""
+    return [
+        (tag["slug"], tag["name"])
+        for tag in tags_cache.get().data
+        if tag["slug"]
+    ]
 
 
 class RecipeListFilter(FilterSet):
@@ -17,9 +19,8 @@ class RecipeListFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method="get_is_in_shopping_cart"
     )
-    tags = filters.AllValuesMultipleFilter(
-        field_name="tags__slug",
-        lookup_expr="exact",
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices, method="get_tags"
     )
 
     class Meta:
@@ -30,14 +31,27 @@ class RecipeListFilter(FilterSet):
             "is_favorited",
         )
 
+    def get_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тэгов, без JOIN и DISTINCT."""
+        tag_ids = [
+            tag["id"] for tag in tags_cache.get().data if tag["slug"] in value
+        ]
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef("pk"), tag_id__in=tag_ids
+                )
+            )
+        )
+
     def get_is_favorited(self, queryset, name, value):
         """Возвращает значение boolean по полю is_favorited."""
         if value:
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def get_is_in_shopping_cart(self, queryset, name, value):
         """Возвращает значение boolean по полю is_in_shopping_cart."""
         if value:
-            return queryset.filter(cart__user=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
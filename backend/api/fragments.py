@@ -0,0 +1,56 @@
+import time
+
+from django.core.cache import cache
+
+from foodgram.settings import RECIPE_FRAGMENT_TTL
+
+
+class RecipeFragmentCache:
+    """Кеш общей для всех пользователей части представления рецепта.
+
+    В ключ входит общая версия: изменение тэгов или ингредиентов меняет
+    её и разом делает устаревшими все фрагменты. Изменения самого
+    рецепта удаляют только его фрагмент.
+    """
+
+    version_key = "recipe_fragments:version"
+
+    def get_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, time.time(), None)
+            version = cache.get(self.version_key)
+        return version
+
+    def bump_version(self):
+        cache.set(self.version_key, time.time(), None)
+
+    def get_keys(self, recipe_ids):
+        version = self.get_version()
+        return {
+            recipe_id: f"recipe_fragment:{version}:{recipe_id}"
+            for recipe_id in recipe_ids
+        }
+
+    def get_many(self, recipe_ids):
+        """Фрагменты из кеша: {id рецепта: фрагмент}."""
+        keys = self.get_keys(recipe_ids)
+        cached = cache.get_many(keys.values())
+        return {
+            recipe_id: cached[key]
+            for recipe_id, key in keys.items()
+            if key in cached
+        }
+
+    def set_many(self, fragments):
+        keys = self.get_keys(fragments)
+        cache.set_many(
+            {keys[recipe_id]: data for recipe_id, data in fragments.items()},
+            RECIPE_FRAGMENT_TTL,
+        )
+
+    def delete_many(self, recipe_ids):
+        cache.delete_many(self.get_keys(recipe_ids).values())
+
+
+recipe_fragments = RecipeFragmentCache()
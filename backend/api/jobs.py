@@ -0,0 +1,114 @@
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from django.core.cache import caches
+
+from foodgram.settings import (
+    SHOPPING_LIST_CACHE,
+    SHOPPING_LIST_JOB_TTL,
+    SHOPPING_LIST_MAX_PENDING_JOBS,
+    SHOPPING_LIST_RENDER_WORKERS,
+)
+from .pdf import render_pdf
+from .utils import get_pdf_cache_key
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_READY = "ready"
+JOB_FAILED = "failed"
+
+_executor = None
+_futures = {}
+_lock = threading.Lock()
+
+
+def get_executor():
+    """Пул процессов для рендера PDF, создаётся при первой задаче."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=SHOPPING_LIST_RENDER_WORKERS
+        )
+    return _executor
+
+
+def submit_render(ingredients_in_cart):
+    """Отправляет рендер в пул процессов.
+
+    Пул ломается, если ядро убивает воркер (например, по памяти на
+    большом списке покупок). Сломанный пул пересоздаётся, и отправка
+    повторяется один раз. Возвращает Future или None, если пул
+    так и не принял задачу. Вызывается под _lock.
+    """
+    global _executor
+    for _ in range(2):
+        executor = get_executor()
+        try:
+            return executor.submit(render_pdf, ingredients_in_cart)
+        except BrokenProcessPool:
+            logger.warning("Пул рендера PDF сломан, создаётся новый")
+            _executor = None
+            executor.shutdown(wait=False)
+    return None
+
+
+def get_job_cache_key(job_id):
+    return f"job:{job_id}"
+
+
+def get_job_status(job_id):
+    """Статус задачи или None, если задача неизвестна или истекла.
+
+    Статус хранится в кеше списков покупок, поэтому при общем бэкенде
+    кеша его видят все воркеры, а не только тот, что принял задачу.
+    """
+    cache = caches[SHOPPING_LIST_CACHE]
+    if cache.get(get_pdf_cache_key(job_id)) is not None:
+        return JOB_READY
+    return cache.get(get_job_cache_key(job_id))
+
+
+def finish_job(job_id, future):
+    cache = caches[SHOPPING_LIST_CACHE]
+    with _lock:
+        _futures.pop(job_id, None)
+    if future.cancelled() or future.exception() is not None:
+        cache.set(get_job_cache_key(job_id), JOB_FAILED, SHOPPING_LIST_JOB_TTL)
+        return
+    cache.set(
+        get_pdf_cache_key(job_id), future.result(), SHOPPING_LIST_JOB_TTL
+    )
+    cache.delete(get_job_cache_key(job_id))
+
+
+def enqueue_job(job_id, ingredients_in_cart):
+    """Ставит рендер PDF в очередь.
+
+    Возвращает статус задачи или None, если очередь процесса заполнена.
+    Статус pending записывается только после того, как пул принял
+    задачу, иначе задача отмечается как failed.
+    Одинаковые списки покупок дают один и тот же job_id, поэтому
+    повторная постановка не запускает рендер заново.
+    """
+    status = get_job_status(job_id)
+    if status in (JOB_PENDING, JOB_READY):
+        return status
+    with _lock:
+        if job_id in _futures:
+            return JOB_PENDING
+        if len(_futures) >= SHOPPING_LIST_MAX_PENDING_JOBS:
+            return None
+        future = submit_render(ingredients_in_cart)
+        job_status = JOB_FAILED if future is None else JOB_PENDING
+        caches[SHOPPING_LIST_CACHE].set(
+            get_job_cache_key(job_id), job_status, SHOPPING_LIST_JOB_TTL
+        )
+        if future is None:
+            return JOB_FAILED
+        _futures[job_id] = future
+    future.add_done_callback(partial(finish_job, job_id))
+    return JOB_PENDING
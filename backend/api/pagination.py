@@ -1,5 +1,37 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from foodgram.settings import MAX_PAGE_SIZE
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = "limit"
+    max_page_size = MAX_PAGE_SIZE
+
+
+class CustomCursorPagination(CursorPagination):
+    """Курсорная пагинация: без OFFSET и без COUNT(*) на каждой странице."""
+
+    ordering = "-id"
+    page_size_query_param = "limit"
+    max_page_size = MAX_PAGE_SIZE
+
+
+class CursorPaginationMixin:
+    """Включает курсорную пагинацию параметром ?pagination=cursor.
+
+    Только для действий из cursor_pagination_actions: у остальных
+    может быть своя сортировка, несовместимая с курсором по id.
+    """
+
+    cursor_pagination_class = CustomCursorPagination
+    cursor_pagination_actions = ("list", "subscriptions")
+
+    @property
+    def paginator(self):
+        if (
+            not hasattr(self, "_paginator")
+            and self.action in self.cursor_pagination_actions
+            and self.request.query_params.get("pagination") == "cursor"
+        ):
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
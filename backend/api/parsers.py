@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import MultiPartParser as DjangoParser
+from django.http.multipartparser import MultiPartParserError
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+from foodgram.settings import RECIPE_IMAGE_MAX_SIZE, RECIPE_IMAGE_SIZE_ERROR
+
+
+class RequestEntityTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = RECIPE_IMAGE_SIZE_ERROR.format(
+        size=RECIPE_IMAGE_MAX_SIZE // (1024 * 1024)
+    )
+    default_code = "request_entity_too_large"
+
+
+class UploadTooLarge(MultiPartParserError):
+    pass
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Пишет файлы во временный файл и обрывает загрузку сверх лимита.
+
+    Тело запроса целиком в память не попадает: файл пишется на диск
+    кусками, а запрос с заведомо большим Content-Length отклоняется
+    до чтения тела.
+    """
+
+    def handle_raw_input(
+        self, input_data, meta, content_length, boundary, encoding=None
+    ):
+        limit = RECIPE_IMAGE_MAX_SIZE + settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        if content_length > limit:
+            raise UploadTooLarge()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > RECIPE_IMAGE_MAX_SIZE:
+            self.file.close()
+            raise UploadTooLarge()
+        return super().receive_data_chunk(raw_data, start)
+
+
+class RecipeMultiPartParser(MultiPartParser):
+    """Multipart-форма рецепта с потоковой загрузкой изображения."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context["request"]
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        meta = request.META.copy()
+        meta["CONTENT_TYPE"] = media_type
+        upload_handlers = [LimitedTemporaryFileUploadHandler(request)]
+        try:
+            parser = DjangoParser(meta, stream, upload_handlers, encoding)
+            data, files = parser.parse()
+            return DataAndFiles(data, files)
+        except UploadTooLarge:
+            raise RequestEntityTooLarge()
+        except MultiPartParserError as exc:
+            raise ParseError(f"Multipart form parse error - {exc}")
@@ -0,0 +1,69 @@
+import copy
+
+from fpdf import FPDF
+
+from foodgram.settings import SHOPPING_LIST_FONT
+
+
+class ShoppingListPDF(FPDF):
+    """FPDF, который разбирает файл шрифта один раз на процесс."""
+
+    _fonts_cache = {}
+
+    def add_font(self, family, style="", fname=None, uni="DEPRECATED"):
+        cache_key = (family.lower(), style.upper(), str(fname))
+        cached = self._fonts_cache.get(cache_key)
+        if cached is None:
+            fontkeys = set(self.fonts)
+            super().add_font(family, style, fname)
+            (fontkey,) = set(self.fonts) - fontkeys
+            self._fonts_cache[cache_key] = (
+                fontkey,
+                copy.deepcopy(self.fonts[fontkey]),
+                copy.deepcopy(self.font_files[fontkey]),
+            )
+            return
+        fontkey, font, font_file = cached
+        self.fonts[fontkey] = dict(
+            font,
+            i=len(self.fonts) + 1,
+            subset=copy.deepcopy(font["subset"]),
+        )
+        self.font_files[fontkey] = dict(font_file)
+
+
+def render_pdf(ingredients_in_cart):
+    """Возвращает байты PDF со списком покупок.
+
+    Дата создания в документ не пишется, поэтому одинаковый список
+    всегда даёт одинаковый файл.
+    """
+    pdf = ShoppingListPDF("P", "mm", "A4")
+    pdf.set_creation_date(False)
+    pdf.add_page()
+    pdf.add_font("DejaVu", "", SHOPPING_LIST_FONT)
+    pdf.set_font("DejaVu", "", 24)
+    pdf.cell(40, 10, "Список покупок:", 0, 1)
+    pdf.cell(40, 10, "", 0, 1)
+
+    pdf.set_font("DejaVu", "", 12)
+    pdf.cell(200, 8, f"{'Продукт'.ljust(65)} {'Количество'.rjust(30)}", 0, 1)
+    pdf.line(10, 30, 200, 30)
+    pdf.line(10, 38, 200, 38)
+    line_height = pdf.font_size * 2
+    col_width = pdf.epw / 3
+
+    for line in ingredients_in_cart:
+        pdf.cell(col_width, line_height, line["ingredient__name"])
+        pdf.cell(
+            col_width,
+            line_height,
+            f'{line["ingredient_amount"]}',
+            align="R",
+        )
+        pdf.cell(
+            col_width, line_height, line["ingredient__measurement_unit"], "L"
+        )
+        pdf.ln(line_height)
+
+    return bytes(pdf.output())
@@ -0,0 +1,89 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from recipes.models import Ingredient, Tag
+from .serializers import IngredientSerializer, TagSerializer
+
+ReferenceEntry = namedtuple(
+    "ReferenceEntry", ("version", "data", "content", "etag")
+)
+
+
+class ReferenceCache:
+    """Кеш справочника в памяти процесса с готовым JSON-ответом.
+
+    Актуальность проверяется по версии в общем кеше Django: сигналы
+    моделей меняют версию, и каждый воркер пересобирает свою копию
+    при следующем обращении.
+    """
+
+    def __init__(self, name, get_data):
+        self.name = name
+        self.get_data = get_data
+        self._entry = None
+        self._lock = threading.Lock()
+
+    @property
+    def version_key(self):
+        return f"reference:{self.name}:version"
+
+    def get_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, time.time(), None)
+            version = cache.get(self.version_key)
+        return version
+
+    def bump_version(self):
+        cache.set(self.version_key, time.time(), None)
+
+    def get(self):
+        version = self.get_version()
+        entry = self._entry
+        if entry is not None and entry.version == version:
+            return entry
+        with self._lock:
+            entry = self._entry
+            if entry is None or entry.version != version:
+                data = self.get_data()
+                content = JSONRenderer().render(data)
+                entry = ReferenceEntry(
+                    version, data, content, hashlib.md5(content).hexdigest()
+                )
+                self._entry = entry
+        return entry
+
+    def get_response(self, request):
+        entry = self.get()
+        etag = quote_etag(entry.etag)
+        last_modified = int(entry.version)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = HttpResponse(
+                entry.content, content_type="application/json"
+            )
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+tags_cache = ReferenceCache(
+    "tags",
+    lambda: TagSerializer(Tag.objects.order_by("id"), many=True).data,
+)
+ingredients_cache = ReferenceCache(
+    "ingredients",
+    lambda: IngredientSerializer(
+        Ingredient.objects.order_by("id"), many=True
+    ).data,
+)
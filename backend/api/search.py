@@ -0,0 +1,57 @@
+import bisect
+import threading
+
+from foodgram.settings import INGREDIENT_SEARCH_LIMIT
+from .reference import ingredients_cache
+
+
+def normalize(value):
+    """Приводит строку к виду для поиска без учёта регистра и «ё»."""
+    return value.strip().casefold().replace("ё", "е")
+
+
+class IngredientPrefixIndex:
+    """Отсортированный в памяти процесса индекс названий ингредиентов.
+
+    Поиск по префиксу — двоичный поиск по нормализованным названиям,
+    поэтому автодополнение не обращается к базе данных. Индекс строится
+    из кеша справочника и пересобирается вместе с ним.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._lock = threading.Lock()
+
+    def build(self, entry):
+        ingredients = sorted(
+            (normalize(ingredient["name"]), ingredient["id"], ingredient)
+            for ingredient in entry.data
+        )
+        keys = [key for key, _, _ in ingredients]
+        items = [ingredient for _, _, ingredient in ingredients]
+        return entry, keys, items
+
+    def get_index(self):
+        entry = ingredients_cache.get()
+        index = self._index
+        if index is None or index[0] is not entry:
+            with self._lock:
+                index = self._index
+                if index is None or index[0] is not entry:
+                    index = self._index = self.build(entry)
+        return index[1:]
+
+    def search(self, prefix, limit=INGREDIENT_SEARCH_LIMIT):
+        """Ингредиенты, название которых начинается с prefix."""
+        keys, items = self.get_index()
+        prefix = normalize(prefix)
+        start = bisect.bisect_left(keys, prefix)
+        results = []
+        for position in range(start, min(start + limit, len(keys))):
+            if not keys[position].startswith(prefix):
+                break
+            results.append(items[position])
+        return results
+
+
+ingredient_index = IngredientPrefixIndex()
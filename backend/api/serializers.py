@@ -1,14 +1,19 @@
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models import prefetch_related_objects
 from djoser.serializers import UserCreateSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
 from foodgram.settings import (
     DOUBLE_INGREDIENT_ADD_ERROR,
     DOUBLE_TAGS_ADD_ERROR,
+    INGREDIENT_NOT_EXIST_ERROR,
     RECIPE_FIELD_RESPONSE,
+    RECIPES_BATCH_LIMIT,
     USER_FIELD_RESPONSE,
-    RECIPE_ADD_IN_CART_ERROR,
     RECIPE_ADD_IN_FAVORITE_ERROR,
+    TAG_NOT_EXIST_ERROR,
 )
 
 from recipes.models import (
@@ -17,10 +22,19 @@ from recipes.models import (
     Ingredient,
     IngredientRecipe,
     Recipe,
-    ShoppingCart,
+    RecipeSnapshot,
     Tag,
 )
+from recipes.images import get_variant_urls
+from recipes.snapshots import (
+    build_document,
+    get_ingredients_prefetch,
+    rebuild_snapshots,
+)
 from users.models import User
+from .fields import RecipeImageField
+from .fragments import recipe_fragments
+from .utils import get_recipes_limit, get_subscriptions
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -41,16 +55,39 @@ class CustomUserSerializer(serializers.ModelSerializer):
         fields = USER_FIELD_RESPONSE + ("is_subscribed",)
 
     def get_is_subscribed(self, obj):
-        user = self.context.get("request").user.id
-        return Follow.objects.filter(user=user, author=obj).exists()
+        return obj.id in get_subscriptions(self.context.get("request"))
+
+
+class ImageVariantsField(serializers.Field):
+    """URL превью изображения рецепта по размерам и форматам."""
+
+    def __init__(self, **kwargs):
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        urls = get_variant_urls(recipe)
+        request = self.context.get("request")
+        if request is None:
+            return urls
+        return {
+            size: {
+                file_format: request.build_absolute_uri(url)
+                for file_format, url in formats.items()
+            }
+            for size, formats in urls.items()
+        }
 
 
 class BaseRecipeSerializer(serializers.ModelSerializer):
     """Базовый сериализатор для модели Recipe."""
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = RECIPE_FIELD_RESPONSE + ("id",)
+        fields = RECIPE_FIELD_RESPONSE + ("id", "image_variants")
 
 
 class FollowRepresentationSerializer(CustomUserSerializer):
@@ -60,15 +97,19 @@ class FollowRepresentationSerializer(CustomUserSerializer):
     )
 
     def get_recipes(self, obj):
-        request = self.context.get("request")
-        recipes = obj.recipes.all()
-        recipes_limit = request.query_params.get("recipes_limit")
-        if recipes_limit:
-            recipes = recipes[: int(recipes_limit)]
+        recipes = getattr(obj, "recipes_preview", None)
+        if recipes is None:
+            recipes = obj.recipes.order_by("-id")
+            recipes_limit = get_recipes_limit(self.context.get("request"))
+            if recipes_limit:
+                recipes = recipes[:recipes_limit]
         return BaseRecipeSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
+        recipes_count = getattr(obj, "recipes_count", None)
+        if recipes_count is None:
+            recipes_count = obj.recipes.count()
+        return recipes_count
 
     class Meta:
         model = User
@@ -122,30 +163,17 @@ class FavoriteSerializer(serializers.ModelSerializer):
         return BaseRecipeSerializer(instance.recipe, context=context).data
 
 
-class ShoppingcartSerializer(serializers.ModelSerializer):
-    """Сериализатор списка покупок."""
-
-    recipe = serializers.PrimaryKeyRelatedField(queryset=Recipe.objects.all())
-    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
-
-    class Meta:
-        model = ShoppingCart
-        fields = "__all__"
-        read_only_fields = ("recipe",)
+class RecipeBatchSerializer(serializers.Serializer):
+    """Список id рецептов для пакетного добавления или удаления."""
 
-    def validate(self, data):
-        request = self.context.get("request")
-        if ShoppingCart.objects.filter(
-            user=request.user, recipe=data["recipe"]
-        ).exists():
-            raise serializers.ValidationError(
-                {"detail": RECIPE_ADD_IN_CART_ERROR}
-            )
-        return data
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=RECIPES_BATCH_LIMIT,
+    )
 
-    def to_representation(self, instance):
-        context = {"request": self.context.get("request")}
-        return BaseRecipeSerializer(instance.recipe, context=context).data
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
 
 
 class IngredientRecipeSerializer(serializers.ModelSerializer):
@@ -161,7 +189,7 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
 class IdIngredientRecipeSerializer(IngredientRecipeSerializer):
     """Сериализатор id ингедиента."""
 
-    id = serializers.IntegerField(source="ingredient.id", required=False)
+    id = serializers.IntegerField(source="ingredient_id", required=False)
 
 
 class RepresentationRecipeCreateSerializer(serializers.ModelSerializer):
@@ -180,14 +208,28 @@ class RepresentationRecipeCreateSerializer(serializers.ModelSerializer):
         )
 
 
+def get_ids_errors(model, ids, double_error, not_exist_error):
+    """Ошибки повторяющихся и несуществующих id одним запросом к model."""
+    errors = []
+    if any(count > 1 for count in Counter(ids).values()):
+        errors.append(double_error)
+    existing = set(
+        model.objects.filter(id__in=ids).values_list("id", flat=True)
+    )
+    missing = sorted(set(ids) - existing)
+    if missing:
+        errors.append(
+            not_exist_error.format(ids=", ".join(map(str, missing)))
+        )
+    return errors
+
+
 class RecipeCreateSeializer(serializers.ModelSerializer):
     """Сериализатор создания рецепта."""
 
     author = serializers.HiddenField(default=serializers.CurrentUserDefault())
-    image = Base64ImageField(max_length=None, use_url=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
-    )
+    image = RecipeImageField(max_length=None, use_url=True)
+    tags = serializers.ListField(child=serializers.IntegerField(min_value=1))
     ingredients = IngredientRecipeSerializer(many=True)
 
     class Meta:
@@ -199,23 +241,27 @@ class RecipeCreateSeializer(serializers.ModelSerializer):
             "author",
         )
 
-    def validate_tags(self, value):
-        removing_double = set(value)
-        if len(value) > len(removing_double):
-            raise serializers.ValidationError(
-                {"detail": DOUBLE_TAGS_ADD_ERROR}
+    def validate(self, data):
+        """Проверяет id тэгов и ингредиентов, по запросу на модель."""
+        errors = {}
+        if "tags" in data:
+            tags_errors = get_ids_errors(
+                Tag, data["tags"], DOUBLE_TAGS_ADD_ERROR, TAG_NOT_EXIST_ERROR
             )
-        return value
-
-    # def validate(self, data):
-    #     ingredients_ids = set()
-    #     for ingredient in data["ingredients"]:
-    #         ingredients_ids.add(ingredient["id"])
-    #     if len(data["ingredients"]) > len(ingredients_ids):
-    #         raise serializers.ValidationError(
-    #             {"detail": DOUBLE_INGREDIENT_ADD_ERROR}
-    #         )
-    #     return data
+            if tags_errors:
+                errors["tags"] = tags_errors
+        if "ingredients" in data:
+            ingredients_errors = get_ids_errors(
+                Ingredient,
+                [ingredient["id"] for ingredient in data["ingredients"]],
+                DOUBLE_INGREDIENT_ADD_ERROR,
+                INGREDIENT_NOT_EXIST_ERROR,
+            )
+            if ingredients_errors:
+                errors["ingredients"] = ingredients_errors
+        if errors:
+            raise serializers.ValidationError(errors)
+        return data
 
     def create_recipe_ingredients(self, new_recipe, recipe_ingredients):
         IngredientRecipe.objects.bulk_create(
@@ -230,17 +276,59 @@ class RecipeCreateSeializer(serializers.ModelSerializer):
     def create(self, validated_data):
         recipe_tags = validated_data.pop("tags")
         recipe_ingredients = validated_data.pop("ingredients")
-        new_recipe = Recipe.objects.create(**validated_data)
-        new_recipe.tags.set(recipe_tags)
-        self.create_recipe_ingredients(new_recipe, recipe_ingredients)
+        with transaction.atomic():
+            new_recipe = Recipe.objects.create(**validated_data)
+            new_recipe.tags.set(recipe_tags)
+            self.create_recipe_ingredients(new_recipe, recipe_ingredients)
+            rebuild_snapshots([new_recipe.id])
         return new_recipe
 
+    def update_recipe_ingredients(self, recipe, recipe_ingredients):
+        """Приводит ингредиенты рецепта к новому списку.
+
+        Меняются только отличающиеся строки: новые добавляются, лишние
+        удаляются, у оставшихся обновляется количество, если оно другое.
+        """
+        amounts = {
+            ingredient["id"]: ingredient["amount"]
+            for ingredient in recipe_ingredients
+        }
+        current = {
+            row.ingredient_id: row for row in recipe.ingredient_recipe.all()
+        }
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and amount != row.amount:
+                row.amount = amount
+                changed.append(row)
+        removed = current.keys() - amounts.keys()
+        if removed:
+            IngredientRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ["amount"])
+        self.create_recipe_ingredients(
+            recipe,
+            (
+                {"id": ingredient_id, "amount": amount}
+                for ingredient_id, amount in amounts.items()
+                if ingredient_id not in current
+            ),
+        )
+
     def update(self, instance, validated_data):
-        # prev_ingredients = IngredientRecipe.objects.filter(recipe=instance.id)
-        # prev_ingredients.delete()
-        # ingredients = validated_data.pop("ingredients")
-        # self.create_recipe_ingredients(instance, ingredients)
-        return super().update(instance, validated_data)
+        recipe_tags = validated_data.pop("tags", None)
+        recipe_ingredients = validated_data.pop("ingredients", None)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if recipe_tags is not None:
+                instance.tags.set(recipe_tags)
+            if recipe_ingredients is not None:
+                self.update_recipe_ingredients(instance, recipe_ingredients)
+            rebuild_snapshots([instance.id])
+        return instance
 
     def to_representation(self, instance):
         representation = RepresentationRecipeCreateSerializer(
@@ -292,26 +380,76 @@ class IngredientForRecipeListSerializer(serializers.ModelSerializer):
         )
 
 
+def get_recipe_fragments(recipes):
+    """Фрагменты рецептов: из кеша, затем из снимков, затем из связей.
+
+    Найденное в снимках или собранное заново кладётся в кеш. Тэги и
+    ингредиенты загружаются только для рецептов без снимка, например
+    созданных до появления снимков и ещё не обработанных
+    rebuild_recipe_snapshots.
+    """
+    fragments = recipe_fragments.get_many([recipe.id for recipe in recipes])
+    missing = [recipe for recipe in recipes if recipe.id not in fragments]
+    if not missing:
+        return fragments
+    found = dict(
+        RecipeSnapshot.objects.filter(
+            recipe_id__in=[recipe.id for recipe in missing]
+        ).values_list("recipe_id", "document")
+    )
+    misses = [recipe for recipe in missing if recipe.id not in found]
+    if misses:
+        prefetch_related_objects(misses, "tags", get_ingredients_prefetch())
+        for recipe in misses:
+            found[recipe.id] = build_document(recipe)
+    recipe_fragments.set_many(found)
+    fragments.update(found)
+    return fragments
+
+
+class RecipeFragmentListSerializer(serializers.ListSerializer):
+    """Список рецептов: фрагменты для всей страницы одним обращением к кешу."""
+
+    def to_representation(self, data):
+        recipes = list(
+            data.all() if isinstance(data, models.Manager) else data
+        )
+        fragments = get_recipe_fragments(recipes)
+        return [
+            self.child.personalize(recipe, fragments[recipe.id])
+            for recipe in recipes
+        ]
+
+
 class RecipeListSerializer(serializers.ModelSerializer):
-    """Сериализатор списка рецептов."""
+    """Сериализатор списка рецептов.
+
+    Общая часть берётся из кеша фрагментов, к ней добавляются поля,
+    зависящие от пользователя, и ссылки на изображения.
+    """
 
     author = CustomUserSerializer()
     ingredients = IngredientForRecipeListSerializer(
         many=True, source="ingredient_recipe"
     )
-    is_favorited = serializers.SerializerMethodField(
-        method_name="get_is_favorited"
-    )
-    is_in_shopping_cart = serializers.SerializerMethodField(
-        method_name="get_is_in_shopping_cart"
-    )
+    is_favorited = serializers.BooleanField(read_only=True)
+    is_in_shopping_cart = serializers.BooleanField(read_only=True)
     tags = TagSerializer(many=True)
+    image_variants = ImageVariantsField()
+
+    personal_fields = (
+        "image",
+        "image_variants",
+        "is_favorited",
+        "is_in_shopping_cart",
+    )
 
     class Meta:
         model = Recipe
         fields = RECIPE_FIELD_RESPONSE + (
             "author",
             "id",
+            "image_variants",
             "is_favorited",
             "is_in_shopping_cart",
             "ingredients",
@@ -319,11 +457,29 @@ class RecipeListSerializer(serializers.ModelSerializer):
             "text",
         )
         depth = 1
+        list_serializer_class = RecipeFragmentListSerializer
 
-    def get_is_favorited(self, obj):
-        user = self.context.get("request").user.id
-        return Favorite.objects.filter(user=user, recipe=obj.id).exists()
+    def personalize(self, recipe, fragment):
+        """Дополняет фрагмент полями текущего запроса."""
+        request = self.context.get("request")
+        values = dict(fragment)
+        values["author"] = dict(
+            fragment["author"],
+            is_subscribed=request is not None
+            and recipe.author_id in get_subscriptions(request),
+        )
+        for field_name in self.personal_fields:
+            field = self.fields[field_name]
+            attribute = field.get_attribute(recipe)
+            values[field_name] = (
+                None
+                if attribute is None
+                else field.to_representation(attribute)
+            )
+        return {
+            field_name: values[field_name] for field_name in self.Meta.fields
+        }
 
-    def get_is_in_shopping_cart(self, obj):
-        user = self.context.get("request").user.id
-        return ShoppingCart.objects.filter(user=user, recipe=obj.id).exists()
+    def to_representation(self, instance):
+        fragments = get_recipe_fragments([instance])
+        return self.personalize(instance, fragments[instance.id])
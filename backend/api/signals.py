@@ -0,0 +1,112 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+)
+from django.dispatch import receiver
+
+from foodgram.settings import USER_FIELD_RESPONSE
+from recipes.images import schedule_variants
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from users.models import User
+from .fragments import recipe_fragments
+from .reference import ingredients_cache, tags_cache
+
+
+def bump_versions_on_commit(*caches):
+    """После коммита обновляет версии кешей.
+
+    Если обновить версию внутри транзакции, другой воркер может
+    собрать кеш из ещё старых строк и сохранить его под новой версией.
+    """
+    for versioned_cache in caches:
+        transaction.on_commit(versioned_cache.bump_version)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    """Обновляет версию справочника ингредиентов."""
+    bump_versions_on_commit(ingredients_cache, recipe_fragments)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(**kwargs):
+    """Обновляет версию справочника тэгов."""
+    bump_versions_on_commit(tags_cache, recipe_fragments)
+
+
+@receiver(post_save, sender=Recipe)
+def generate_image_variants(instance, **kwargs):
+    """После коммита ставит в очередь превью нового изображения."""
+    image_name = instance.image.name if instance.image else ""
+    if image_name and image_name != instance.image_variants_of:
+        transaction.on_commit(
+            partial(schedule_variants, instance.id, image_name)
+        )
+
+
+def drop_fragments_on_commit(recipe_ids):
+    """После коммита удаляет кешированные фрагменты рецептов."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(
+            partial(recipe_fragments.delete_many, recipe_ids)
+        )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_fragment(instance, **kwargs):
+    drop_fragments_on_commit([instance.id])
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def invalidate_ingredient_recipe_fragment(instance, **kwargs):
+    """Ингредиенты рецепта меняются и без сохранения самого рецепта."""
+    drop_fragments_on_commit([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags_fragment(
+    instance, action, reverse, pk_set, **kwargs
+):
+    """Удаляет фрагменты рецептов, у которых изменился набор тэгов.
+
+    При обратной очистке (tag.recipe_set.clear()) pk_set пуст, поэтому
+    затронутые рецепты запоминаются до очистки.
+    """
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            drop_fragments_on_commit([instance.id])
+        return
+    if action == "pre_clear":
+        instance._fragment_recipe_ids = list(
+            Recipe.tags.through.objects.filter(
+                tag_id=instance.id
+            ).values_list("recipe_id", flat=True)
+        )
+    elif action == "post_clear":
+        drop_fragments_on_commit(
+            getattr(instance, "_fragment_recipe_ids", ())
+        )
+    elif action in ("post_add", "post_remove"):
+        drop_fragments_on_commit(pk_set or ())
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_fragments(instance, update_fields=None, **kwargs):
+    """Удаляет фрагменты рецептов при изменении данных автора."""
+    if update_fields is not None and not set(update_fields) & set(
+        USER_FIELD_RESPONSE
+    ):
+        return
+    recipe_ids = list(
+        Recipe.objects.filter(author=instance).values_list("id", flat=True)
+    )
+    drop_fragments_on_commit(recipe_ids)
@@ -0,0 +1,86 @@
+from unittest import skipUnless
+
+from django.db import connection
+from rest_framework.test import (
+    APIRequestFactory,
+    APITestCase,
+    force_authenticate,
+)
+
+from api.views import RecipeViewSet
+from recipes.models import Favorite, Ingredient, Recipe
+from users.models import User
+
+AUTHORS = 30
+RECIPES = 6000
+INGREDIENTS = 5000
+FAVORITES = 500
+
+
+@skipUnless(connection.vendor == "postgresql", "Планы запросов PostgreSQL")
+class RecipeIndexesTests(APITestCase):
+    """Списки рецептов и проверка ингредиентов читаются по индексам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = User.objects.bulk_create(
+            User(username=f"author{index}", email=f"author{index}@test.ru")
+            for index in range(AUTHORS)
+        )
+        cls.author = authors[AUTHORS // 2]
+        cls.user = User.objects.create_user(
+            username="user", email="user@test.ru", password="pass"
+        )
+        # Рецепты автора добавляются подряд, как и при обычной работе.
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                name=f"Рецепт {index}",
+                text="Описание",
+                cooking_time=10,
+                author=authors[index * AUTHORS // RECIPES],
+            )
+            for index in range(RECIPES)
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe)
+            for recipe in recipes[:FAVORITES]
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"Ингредиент {index}", measurement_unit="г")
+            for index in range(INGREDIENTS)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def get_list_plan(self, params):
+        """План первой страницы списка рецептов с фильтрами."""
+        request = APIRequestFactory().get("/api/collect/", params)
+        force_authenticate(request, self.user)
+        view = RecipeViewSet(
+            action_map={"get": "list"}, format_kwarg=None, args=(), kwargs={}
+        )
+        view.request = view.initialize_request(request)
+        queryset = view.filter_queryset(view.get_queryset())
+        return queryset[:6].explain()
+
+    def assert_recipe_index(self, plan):
+        self.assertIn("recipe_author_id_idx", plan)
+        self.assertNotIn("Seq Scan on recipes_recipe", plan)
+
+    def test_list_uses_index(self):
+        self.assert_recipe_index(self.get_list_plan({}))
+
+    def test_favorite_filter_uses_index(self):
+        self.assert_recipe_index(self.get_list_plan({"is_favorited": "1"}))
+
+    def test_author_filter_uses_index(self):
+        self.assert_recipe_index(
+            self.get_list_plan({"author": self.author.id})
+        )
+
+    def test_ingredient_lookup_uses_index(self):
+        plan = Ingredient.objects.filter(
+            name="Ингредиент 1", measurement_unit="г"
+        ).explain()
+        self.assertIn("ingredient_name_unit_idx", plan)
+        self.assertNotIn("Seq Scan on recipes_ingredient", plan)
@@ -0,0 +1,77 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+from django.core.cache import caches
+from rest_framework.test import APITestCase
+
+from api import jobs
+from users.models import User
+
+JOB_ID = "a" * 64
+
+
+def get_broken_executor():
+    """Пул процессов, воркер которого аварийно завершился."""
+    executor = ProcessPoolExecutor(max_workers=1)
+    executor.submit(os._exit, 1).exception()
+    return executor
+
+
+class ShoppingListJobsTests(APITestCase):
+    """Сломанный пул рендера не ломает очередь задач."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="user", email="user@test.ru", password="pass"
+        )
+
+    def setUp(self):
+        caches["shopping_list"].clear()
+        self.broken = get_broken_executor()
+        self.addCleanup(self.broken.shutdown)
+        self.addCleanup(self.reset_executor)
+
+    def reset_executor(self):
+        if jobs._executor is not None:
+            jobs._executor.shutdown()
+        jobs._executor = None
+
+    def wait_for_job(self, job_id):
+        for _ in range(200):
+            job_status = jobs.get_job_status(job_id)
+            if job_status != jobs.JOB_PENDING:
+                return job_status
+            time.sleep(0.05)
+        return job_status
+
+    def test_broken_pool_is_replaced(self):
+        jobs._executor = self.broken
+        self.assertEqual(jobs.enqueue_job(JOB_ID, []), jobs.JOB_PENDING)
+        self.assertIsNot(jobs._executor, self.broken)
+        self.assertEqual(self.wait_for_job(JOB_ID), jobs.JOB_READY)
+
+    def test_failed_retry_marks_job_failed(self):
+        with mock.patch.object(
+            jobs, "get_executor", return_value=self.broken
+        ):
+            self.assertEqual(jobs.enqueue_job(JOB_ID, []), jobs.JOB_FAILED)
+        self.assertEqual(jobs.get_job_status(JOB_ID), jobs.JOB_FAILED)
+        self.assertNotIn(JOB_ID, jobs._futures)
+
+    def test_failed_submit_returns_503(self):
+        self.client.force_authenticate(self.user)
+        url = "/api/collect/download_shopping_cart/jobs/"
+        with mock.patch.object(
+            jobs, "get_executor", return_value=self.broken
+        ):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data["status"], jobs.JOB_FAILED)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(
+            self.wait_for_job(response.data["id"]), jobs.JOB_READY
+        )
@@ -0,0 +1,108 @@
+from django.core.cache import caches
+from rest_framework.test import APITestCase
+
+from recipes.models import (
+    Favorite,
+    Follow,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from users.models import User
+
+# Запросы списка рецептов: подсчёт, страница, снимки, тэги и ингредиенты
+# для рецептов без снимка. С прогретым кешем фрагментов остаются только
+# подсчёт и страница.
+LIST_QUERIES_COLD = 5
+LIST_QUERIES_WARM = 2
+DETAIL_QUERIES_COLD = 4
+DETAIL_QUERIES_WARM = 1
+# Для пользователя добавляется выборка его подписок.
+USER_QUERIES = 1
+
+
+class RecipeQueriesTests(APITestCase):
+    """Число запросов к базе не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username="author", email="author@test.ru", password="pass"
+        )
+        cls.user = User.objects.create_user(
+            username="user", email="user@test.ru", password="pass"
+        )
+        tags = [
+            Tag.objects.create(
+                name=f"Тэг {index}", slug=f"tag{index}", color="#ffffff"
+            )
+            for index in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f"Ингредиент {index}", measurement_unit="г"
+            )
+            for index in range(5)
+        ]
+        recipes = []
+        for index in range(8):
+            recipe = Recipe.objects.create(
+                name=f"Рецепт {index}",
+                text="Описание",
+                cooking_time=10,
+                author=cls.author,
+            )
+            recipe.tags.set(tags[: index % 3 + 1])
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=amount + 1
+                )
+                for amount, ingredient in enumerate(
+                    ingredients[: index % 5 + 1]
+                )
+            )
+            recipes.append(recipe)
+        cls.recipe = recipes[0]
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Favorite.objects.create(user=cls.user, recipe=recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=recipes[1])
+
+    def setUp(self):
+        for alias in ("default", "shopping_list"):
+            caches[alias].clear()
+
+    def get_clients(self):
+        yield "anonymous", 0
+        self.client.force_authenticate(self.user)
+        yield "user", USER_QUERIES
+
+    def assert_queries(self, url, cold, warm):
+        caches["default"].clear()
+        with self.assertNumQueries(cold):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(warm):
+            self.client.get(url)
+        return response
+
+    def test_list_queries(self):
+        for kind, extra in self.get_clients():
+            for limit in (2, 6):
+                with self.subTest(kind=kind, limit=limit):
+                    response = self.assert_queries(
+                        f"/api/collect/?limit={limit}",
+                        LIST_QUERIES_COLD + extra,
+                        LIST_QUERIES_WARM + extra,
+                    )
+                    self.assertEqual(len(response.data["results"]), limit)
+
+    def test_detail_queries(self):
+        for kind, extra in self.get_clients():
+            with self.subTest(kind=kind):
+                self.assert_queries(
+                    f"/api/collect/{self.recipe.id}/",
+                    DETAIL_QUERIES_COLD + extra,
+                    DETAIL_QUERIES_WARM + extra,
+                )
@@ -1,40 +1,191 @@
-from django.http import FileResponse
+import csv
+import hashlib
+import io
+import json
 
-from fpdf import FPDF
+from django.core.cache import caches
+from django.db.models import OuterRef, Subquery
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from rest_framework.exceptions import ValidationError
 
+from foodgram.settings import (
+    RECIPES_LIMIT_ERROR,
+    SHOPPING_LIST_CACHE,
+    SHOPPING_LIST_FILENAME,
+)
+from recipes.models import Follow, Recipe
+from .pdf import render_pdf
 
-def generate_pdf(ingredients_in_cart):
 
-    pdf = FPDF("P", "mm", "A4")
-    pdf.add_page()
-    pdf.add_font("DejaVu", "", "fonts/DejaVuSansCondensed.ttf", uni=True)
-    pdf.set_font("DejaVu", "", 24)
-    pdf.cell(40, 10, "Список покупок:", 0, 1)
-    pdf.cell(40, 10, "", 0, 1)
+def get_subscriptions(request):
+    """Возвращает id авторов, на которых подписан пользователь запроса.
 
-    pdf.set_font("DejaVu", "", 12)
-    pdf.cell(200, 8, f"{'Продукт'.ljust(65)} {'Количество'.rjust(30)}", 0, 1)
-    pdf.line(10, 30, 200, 30)
-    pdf.line(10, 38, 200, 38)
-    line_height = pdf.font_size * 2
-    col_width = pdf.epw / 3
+    Множество загружается одним запросом и запоминается на объекте
+    запроса, поэтому все сериализаторы ответа используют общий результат.
+    """
+    subscriptions = getattr(request, "_subscriptions", None)
+    if subscriptions is None:
+        if request.user.is_authenticated:
+            subscriptions = frozenset(
+                Follow.objects.filter(user=request.user).values_list(
+                    "author_id", flat=True
+                )
+            )
+        else:
+            subscriptions = frozenset()
+        request._subscriptions = subscriptions
+    return subscriptions
 
-    for line in ingredients_in_cart:
-        pdf.cell(col_width, line_height, line["ingredient__name"])
-        pdf.cell(
-            col_width,
-            line_height,
-            f'{line["ingredient_amount"]}',
-            align="R",
+
+def get_recipes_limit(request):
+    """Возвращает проверенное значение параметра recipes_limit или None."""
+    recipes_limit = request.query_params.get("recipes_limit")
+    if not recipes_limit:
+        return None
+    try:
+        recipes_limit = int(recipes_limit)
+    except ValueError:
+        raise ValidationError({"recipes_limit": RECIPES_LIMIT_ERROR})
+    if recipes_limit < 1:
+        raise ValidationError({"recipes_limit": RECIPES_LIMIT_ERROR})
+    return recipes_limit
+
+
+def get_recipes_preview(recipes_limit=None):
+    """Рецепты для превью подписок: не больше recipes_limit на автора.
+
+    Ограничение считается коррелированным подзапросом, поэтому превью
+    всех авторов страницы загружается одним запросом в prefetch.
+    """
+    recipes = Recipe.objects.order_by("-id")
+    if recipes_limit is None:
+        return recipes
+    return recipes.filter(
+        id__in=Subquery(
+            Recipe.objects.filter(author=OuterRef("author"))
+            .order_by("-id")
+            .values("id")[:recipes_limit]
         )
-        pdf.cell(
-            col_width, line_height, line["ingredient__measurement_unit"], "L"
+    )
+
+
+def get_shopping_list_hash(ingredients_in_cart):
+    """Хеш строк списка покупок: ингредиент, единица измерения, количество."""
+    digest = hashlib.sha256()
+    for line in ingredients_in_cart:
+        digest.update(
+            "{}\t{}\t{}\n".format(
+                line["ingredient__name"],
+                line["ingredient__measurement_unit"],
+                line["ingredient_amount"],
+            ).encode()
         )
-        pdf.ln(line_height)
+    return digest.hexdigest()
+
 
-    pdf.output("shopping_list.pdf", "F")
-    return FileResponse(
-        open("shopping_list.pdf", "rb"),
+def get_pdf_cache_key(shopping_list_hash):
+    return f"pdf:{shopping_list_hash}"
+
+
+def get_pdf(ingredients_in_cart, shopping_list_hash):
+    """Возвращает PDF из кеша или рендерит и сохраняет его."""
+    cache = caches[SHOPPING_LIST_CACHE]
+    cache_key = get_pdf_cache_key(shopping_list_hash)
+    content = cache.get(cache_key)
+    if content is None:
+        content = render_pdf(ingredients_in_cart)
+        cache.set(cache_key, content)
+    return content
+
+
+def get_pdf_response(content, shopping_list_hash):
+    response = FileResponse(
+        io.BytesIO(content),
         as_attachment=True,
+        filename=SHOPPING_LIST_FILENAME.format(extension="pdf"),
         content_type="application/pdf",
     )
+    response["ETag"] = quote_etag(shopping_list_hash)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def generate_pdf(request, ingredients_in_cart):
+    """Отдаёт PDF списка покупок с ETag по хешу его содержимого."""
+    ingredients_in_cart = list(ingredients_in_cart)
+    shopping_list_hash = get_shopping_list_hash(ingredients_in_cart)
+    etag = quote_etag(shopping_list_hash)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return get_pdf_response(
+        get_pdf(ingredients_in_cart, shopping_list_hash), shopping_list_hash
+    )
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def stream_text(ingredients_in_cart):
+    yield "Список покупок:\n\n"
+    for line in ingredients_in_cart:
+        yield "{} ({}) — {}\n".format(
+            line["ingredient__name"],
+            line["ingredient__measurement_unit"],
+            line["ingredient_amount"],
+        )
+
+
+def stream_csv(ingredients_in_cart):
+    writer = csv.writer(Echo())
+    yield writer.writerow(("name", "measurement_unit", "amount"))
+    for line in ingredients_in_cart:
+        yield writer.writerow(
+            (
+                line["ingredient__name"],
+                line["ingredient__measurement_unit"],
+                line["ingredient_amount"],
+            )
+        )
+
+
+def stream_json(ingredients_in_cart):
+    yield "["
+    for index, line in enumerate(ingredients_in_cart):
+        item = json.dumps(
+            {
+                "name": line["ingredient__name"],
+                "measurement_unit": line["ingredient__measurement_unit"],
+                "amount": line["ingredient_amount"],
+            },
+            ensure_ascii=False,
+        )
+        yield f",{item}" if index else item
+    yield "]"
+
+
+SHOPPING_LIST_FORMATS = {
+    "txt": (stream_text, "text/plain; charset=utf-8"),
+    "csv": (stream_csv, "text/csv; charset=utf-8"),
+    "json": (stream_json, "application/json"),
+}
+
+
+def stream_shopping_list(ingredients_in_cart, file_format):
+    """Построчно отдаёт список покупок в текстовом формате без рендера PDF."""
+    stream, content_type = SHOPPING_LIST_FORMATS[file_format]
+    response = StreamingHttpResponse(
+        stream(ingredients_in_cart.iterator()), content_type=content_type
+    )
+    response["Content-Disposition"] = 'attachment; filename="{}"'.format(
+        SHOPPING_LIST_FILENAME.format(extension=file_format)
+    )
+    return response
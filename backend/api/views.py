@@ -1,19 +1,39 @@
-from django.db.models import Sum
+from django.db.models import (
+    BooleanField,
+    Count,
+    Exists,
+    OuterRef,
+    Prefetch,
+    Sum,
+    Value,
+)
+from django.core.cache import caches
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
 from foodgram.settings import (
+    RECIPE_ADD_IN_CART_ERROR,
+    RECIPE_ADD_IN_FAVORITE_ERROR,
+    SHOPPING_LIST_CACHE,
+    SHOPPING_LIST_FORMAT_ERROR,
+    SHOPPING_LIST_JOB_FAILED_ERROR,
+    SHOPPING_LIST_JOB_NOT_FOUND_ERROR,
+    SHOPPING_LIST_QUEUE_FULL_ERROR,
     SUBSCRIBING_NOT_EXIST_ERROR,
     USER_NOT_EXIST_ERROR,
     DELETE_FOLLOWING_MESSAGE,
 )
-from .filter import RecipeListFilter, IngredientSearchFilter
+from .filter import RecipeListFilter
+from .jobs import JOB_FAILED, JOB_READY, enqueue_job, get_job_status
+from .pagination import CursorPaginationMixin
+from .parsers import RecipeMultiPartParser
 from .permissions import IsAuthorOrReadOnly
 from recipes.models import (
     Favorite,
@@ -24,23 +44,37 @@ from recipes.models import (
     ShoppingCart,
     Tag,
 )
+from .reference import ingredients_cache, tags_cache
+from .search import ingredient_index
 from .serializers import (
     CustomUserSerializer,
     FavoriteSerializer,
     FollowRepresentationSerializer,
     FollowSerializer,
     IngredientSerializer,
+    RecipeBatchSerializer,
     RecipeCreateSeializer,
     RecipeListSerializer,
-    ShoppingcartSerializer,
     TagSerializer,
     BaseRecipeSerializer,
 )
 from users.models import User
-from .utils import generate_pdf
+from .utils import (
+    SHOPPING_LIST_FORMATS,
+    generate_pdf,
+    get_pdf_cache_key,
+    get_pdf_response,
+    get_recipes_limit,
+    get_recipes_preview,
+    get_shopping_list_hash,
+    stream_shopping_list,
+)
+
+BATCH_ADD_STATUSES = {True: "added", False: "exists", None: "not_found"}
+BATCH_REMOVE_STATUSES = {True: "removed", False: "not_exists"}
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(CursorPaginationMixin, UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
 
@@ -48,6 +82,7 @@ class CustomUserViewSet(UserViewSet):
     def subscribe(self, request, id):
 
         if self.request.method == "POST":
+            get_recipes_limit(request)
             try:
                 author = User.objects.get(id=id)
             except User.DoesNotExist:
@@ -82,7 +117,19 @@ class CustomUserViewSet(UserViewSet):
 
     @action(methods=["GET"], url_path="subscriptions", detail=False)
     def subscriptions(self, request):
-        data = User.objects.filter(following__user=request.user)
+        recipes_limit = get_recipes_limit(request)
+        data = (
+            User.objects.filter(following__user=request.user)
+            .annotate(recipes_count=Count("recipes"))
+            .prefetch_related(
+                Prefetch(
+                    "recipes",
+                    queryset=get_recipes_preview(recipes_limit),
+                    to_attr="recipes_preview",
+                )
+            )
+            .order_by("id")
+        )
         pages = self.paginate_queryset(data)
         serializer = FollowRepresentationSerializer(
             pages, many=True, context={"request": request}
@@ -90,15 +137,54 @@ class CustomUserViewSet(UserViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(CursorPaginationMixin, ModelViewSet):
     """Рецепты."""
 
-    queryset = Recipe.objects.all()
+    # Тэги и ингредиенты догружает RecipeListSerializer, и только для
+    # рецептов, которых нет в кеше фрагментов.
+    queryset = Recipe.objects.select_related("author")
     filter_backends = (DjangoFilterBackend,)
     filter_class = RecipeListFilter
+    parser_classes = (JSONParser, RecipeMultiPartParser)
     filterset_fields = ["author", "tags"]
     # permission_classes = (IsAuthorOrReadOnly,)
 
+    def get_queryset(self):
+        """Добавляет к рецептам отметки избранного и списка покупок."""
+        queryset = super().get_queryset()
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+        )
+
+    def perform_content_negotiation(self, request, force=False):
+        # В download_shopping_cart параметр format выбирает формат файла,
+        # поэтому неизвестный DRF формат не должен приводить к 404.
+        if self.action == "download_shopping_cart":
+            force = True
+        return super().perform_content_negotiation(request, force)
+
+    def get_ingredients_in_cart(self):
+        """Суммарные количества ингредиентов из списка покупок."""
+        return (
+            IngredientRecipe.objects.filter(
+                recipe__cart__user=self.request.user
+            )
+            .values("ingredient__name", "ingredient__measurement_unit")
+            .annotate(ingredient_amount=Sum("amount"))
+            .order_by("ingredient__name", "ingredient__measurement_unit")
+        )
+
     def perform_create(self, serializer):
         """Создает рецепт."""
         serializer.save(
@@ -106,40 +192,145 @@ class RecipeViewSet(ModelViewSet):
         )
 
     def get_serializer_class(self):
-        if self.request.method in ("POST", "PATCH", "DELETE"):
+        if self.request.method in ("POST", "PUT", "PATCH", "DELETE"):
             return RecipeCreateSeializer
         return RecipeListSerializer
 
+    @action(detail=False, methods=["GET"])
+    def popular(self, request):
+        """Рецепты по убыванию рейтинга популярности."""
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .filter(ranking__isnull=False)
+            .order_by("-ranking__score", "id")
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(
         detail=False,
         methods=["GET"],
         permission_classes=(IsAuthenticated,),
     )
     def download_shopping_cart(self, request):
-        ingredients_in_cart = (
-            IngredientRecipe.objects.filter(recipe__cart__user=request.user)
-            .values("ingredient__name", "ingredient__measurement_unit")
-            .annotate(ingredient_amount=Sum("amount"))
+        file_format = request.query_params.get("format", "pdf")
+        if file_format != "pdf" and file_format not in SHOPPING_LIST_FORMATS:
+            formats = ", ".join(("pdf",) + tuple(SHOPPING_LIST_FORMATS))
+            return Response(
+                {"format": SHOPPING_LIST_FORMAT_ERROR.format(formats=formats)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        ingredients_in_cart = self.get_ingredients_in_cart()
+        if file_format == "pdf":
+            return generate_pdf(request, ingredients_in_cart)
+        return stream_shopping_list(ingredients_in_cart, file_format)
+
+    @action(
+        detail=False,
+        methods=["POST"],
+        url_path="download_shopping_cart/jobs",
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_job(self, request):
+        """Ставит рендер PDF списка покупок в фоновую очередь."""
+        ingredients_in_cart = list(self.get_ingredients_in_cart())
+        job_id = get_shopping_list_hash(ingredients_in_cart)
+        job_status = enqueue_job(job_id, ingredients_in_cart)
+        if job_status is None:
+            return Response(
+                {"detail": SHOPPING_LIST_QUEUE_FULL_ERROR},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        if job_status == JOB_FAILED:
+            # Пул рендера не принял задачу; повторный запрос попробует снова.
+            return Response(
+                {
+                    "id": job_id,
+                    "status": job_status,
+                    "detail": SHOPPING_LIST_JOB_FAILED_ERROR,
+                },
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        return Response(
+            {"id": job_id, "status": job_status},
+            status=status.HTTP_202_ACCEPTED,
         )
-        return generate_pdf(ingredients_in_cart)
 
-    def base_shopping_cart_favorite(self, model, pk, serializer):
-        recipe = get_object_or_404(Recipe, id=pk)
-        serializer = serializer(
-            data={"user": self.request.user.id, "recipe": recipe.id},
-            context={"request": self.request},
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path=r"download_shopping_cart/jobs/(?P<job_id>[0-9a-f]{64})",
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_job_result(self, request, job_id):
+        """Статус фоновой задачи или готовый PDF."""
+        job_status = get_job_status(job_id)
+        if job_status is None:
+            return Response(
+                {"detail": SHOPPING_LIST_JOB_NOT_FOUND_ERROR},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        if job_status == JOB_FAILED:
+            return Response(
+                {
+                    "id": job_id,
+                    "status": job_status,
+                    "detail": SHOPPING_LIST_JOB_FAILED_ERROR,
+                },
+                status=status.HTTP_200_OK,
+            )
+        if job_status == JOB_READY:
+            content = caches[SHOPPING_LIST_CACHE].get(
+                get_pdf_cache_key(job_id)
+            )
+            if content is not None:
+                return get_pdf_response(content, job_id)
+        return Response(
+            {"id": job_id, "status": job_status},
+            status=status.HTTP_202_ACCEPTED,
         )
+
+    def base_shopping_cart_favorite(self, model, pk, add_error):
+        recipe = get_object_or_404(Recipe, id=pk)
         if self.request.method == "POST":
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
+            if not model.objects.add(self.request.user, recipe):
+                return Response(
+                    {"detail": [add_error]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
             serializer = BaseRecipeSerializer(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        object = model.objects.filter(user=self.request.user, recipe=recipe)
-        if not object.exists():
+        if not model.objects.remove(self.request.user, recipe):
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        object.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def base_shopping_cart_favorite_batch(self, model):
+        """Добавляет или удаляет пачку рецептов в одной транзакции."""
+        serializer = RecipeBatchSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data["recipes"]
+        user = self.request.user
+        if self.request.method == "POST":
+            added = model.objects.add_many(user, recipe_ids)
+            results = [
+                {
+                    "id": recipe_id,
+                    "status": BATCH_ADD_STATUSES[added.get(recipe_id)],
+                }
+                for recipe_id in recipe_ids
+            ]
+        else:
+            removed = model.objects.remove_many(user, recipe_ids)
+            results = [
+                {
+                    "id": recipe_id,
+                    "status": BATCH_REMOVE_STATUSES[recipe_id in removed],
+                }
+                for recipe_id in recipe_ids
+            ]
+        return Response(results, status=status.HTTP_200_OK)
+
     @action(
         detail=True,
         methods=("POST", "DELETE"),
@@ -148,7 +339,7 @@ class RecipeViewSet(ModelViewSet):
     )
     def favorite(self, request, pk):
         return self.base_shopping_cart_favorite(
-            Favorite, pk, FavoriteSerializer
+            Favorite, pk, RECIPE_ADD_IN_FAVORITE_ERROR
         )
 
     @action(
@@ -159,9 +350,27 @@ class RecipeViewSet(ModelViewSet):
     )
     def shopping_cart(self, request, pk):
         return self.base_shopping_cart_favorite(
-            ShoppingCart, pk, ShoppingcartSerializer
+            ShoppingCart, pk, RECIPE_ADD_IN_CART_ERROR
         )
 
+    @action(
+        detail=False,
+        methods=("POST", "DELETE"),
+        url_path="favorite/batch",
+        permission_classes=(IsAuthenticated,),
+    )
+    def favorite_batch(self, request):
+        return self.base_shopping_cart_favorite_batch(Favorite)
+
+    @action(
+        detail=False,
+        methods=("POST", "DELETE"),
+        url_path="shopping_cart/batch",
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_batch(self, request):
+        return self.base_shopping_cart_favorite_batch(ShoppingCart)
+
 
 class FavoriteViewSet(ModelViewSet):
     """Избранное."""
@@ -178,11 +387,15 @@ class IngredientViewSet(ReadOnlyModelViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = [IngredientSearchFilter]
-    search_fields = ["^name"]
     permission_classes = (AllowAny,)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name")
+        if name:
+            return Response(ingredient_index.search(name))
+        return ingredients_cache.get_response(request)
+
 
 class TagViewSet(ModelViewSet):
     """Тэги."""
@@ -191,3 +404,6 @@ class TagViewSet(ModelViewSet):
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
+
+    def list(self, request, *args, **kwargs):
+        return tags_cache.get_response(request)
@@ -137,6 +137,25 @@ MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
+# В default хранятся версии справочников (тэги, ингредиенты), а готовые
+# PDF списков покупок — по хешу содержимого. В продакшене оба кеша нужно
+# перенести в memcached/redis, чтобы они были общими для воркеров.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Здесь же лежат статусы фоновых задач PDF. С locmem они видны только
+    # процессу, принявшему задачу, поэтому без общего бэкенда приложение
+    # должно работать в один воркер.
+    "shopping_list": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "shopping_list",
+        "TIMEOUT": 60 * 60 * 24,
+        "OPTIONS": {"MAX_ENTRIES": 500},
+    },
+}
+
+
 DJOSER = {
     "HIDE_USERS": False,
     "LOGIN_FIELD": "email",
@@ -165,6 +184,32 @@ REST_FRAMEWORK = {
 # Кастомные переменные
 
 MIN_COOKING_TIME = 1
+INGREDIENT_SEARCH_LIMIT = 20
+MAX_PAGE_SIZE = 100
+RECIPES_BATCH_LIMIT = 100
+RECIPE_FRAGMENT_TTL = 60 * 60
+RECIPE_SNAPSHOT_BATCH_SIZE = 200
+RECIPE_SNAPSHOT_WORKERS = 4
+# Наибольшая сторона превью изображений рецептов, в пикселях
+RECIPE_IMAGE_VARIANTS = {"small": 320, "medium": 800}
+RECIPE_IMAGE_FORMATS = ("webp", "jpeg")
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_WORKERS = 2
+RECIPE_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+RECIPE_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+# Файлы моложе этого срока сборщик мусора не трогает, в часах
+MEDIA_GC_GRACE_HOURS = 24
+MEDIA_GC_BATCH_SIZE = 500
+RANKING_HALF_LIFE_DAYS = 7
+RANKING_FAVORITE_WEIGHT = 1.0
+RANKING_CART_WEIGHT = 0.5
+RANKING_BATCH_SIZE = 500
+SHOPPING_LIST_FONT = os.path.join(BASE_DIR, "fonts", "DejaVuSansCondensed.ttf")
+SHOPPING_LIST_FILENAME = "shopping_list.{extension}"
+SHOPPING_LIST_CACHE = "shopping_list"
+SHOPPING_LIST_RENDER_WORKERS = 2
+SHOPPING_LIST_MAX_PENDING_JOBS = 20
+SHOPPING_LIST_JOB_TTL = 60 * 30
 USER_FIELD_RESPONSE = (
     "email",
     "id",
@@ -190,4 +235,15 @@ RECIPE_ADD_IN_FAVORITE_ERROR = "Этот рецепт уже добавлен в
 RECIPE_DELETE_FROM_FAVORITE_ERROR = "Этот рецепт не добавлен в избранное."
 DOUBLE_INGREDIENT_ADD_ERROR = "Вы добавили два одинаковых ингредиента."
 DOUBLE_TAGS_ADD_ERROR = "Вы добавили два одинаковых тега."
+INGREDIENT_NOT_EXIST_ERROR = "Ингредиенты не существуют: {ids}."
+TAG_NOT_EXIST_ERROR = "Тэги не существуют: {ids}."
 DELETE_FOLLOWING_MESSAGE = "Вы отписались от пользователя {author}."
+SHOPPING_LIST_FORMAT_ERROR = "Доступные форматы списка покупок: {formats}."
+SHOPPING_LIST_QUEUE_FULL_ERROR = "Очередь занята, повторите запрос позже."
+SHOPPING_LIST_JOB_NOT_FOUND_ERROR = "Задача не найдена или устарела."
+SHOPPING_LIST_JOB_FAILED_ERROR = "Не удалось сформировать список покупок."
+RECIPE_IMAGE_SIZE_ERROR = "Размер изображения не должен превышать {size} МБ."
+RECIPE_IMAGE_PIXELS_ERROR = (
+    "Изображение не должно быть больше {pixels} мегапикселей."
+)
+RECIPES_LIMIT_ERROR = "recipes_limit должен быть целым положительным числом."
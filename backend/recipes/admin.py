@@ -6,9 +6,12 @@ from .models import (
     Ingredient,
     IngredientRecipe,
     Recipe,
+    RecipeRanking,
+    RecipeSnapshot,
     ShoppingCart,
     Tag,
 )
+from .snapshots import rebuild_snapshots
 from users.models import User
 
 EMPTY_VALUE_DISPLAY = "-пусто-"
@@ -117,6 +120,10 @@ class RecipeClass(admin.ModelAdmin):
     search_fields = ("name",)
     empty_value_display = EMPTY_VALUE_DISPLAY
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        rebuild_snapshots([form.instance.id])
+
 
 @admin.register(IngredientRecipe)
 class IngredientRecipeClass(admin.ModelAdmin):
@@ -136,6 +143,19 @@ class IngredientRecipeClass(admin.ModelAdmin):
     ordering = ("-recipe",)
     empty_value_display = EMPTY_VALUE_DISPLAY
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        rebuild_snapshots([obj.recipe_id])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        rebuild_snapshots([obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = list(queryset.values_list("recipe_id", flat=True))
+        super().delete_queryset(request, queryset)
+        rebuild_snapshots(recipe_ids)
+
 
 @admin.register(Follow)
 class FollowClass(admin.ModelAdmin):
@@ -183,3 +203,31 @@ class ShoppingCartClass(admin.ModelAdmin):
     list_filter = ("user", "recipe")
     ordering = ("-id",)
     empty_value_display = EMPTY_VALUE_DISPLAY
+
+
+@admin.register(RecipeSnapshot)
+class RecipeSnapshotClass(admin.ModelAdmin):
+    """Админка снимков рецептов."""
+
+    list_display = (
+        "recipe",
+        "built_at",
+    )
+    readonly_fields = ("recipe", "document", "built_at")
+    ordering = ("-built_at",)
+    empty_value_display = EMPTY_VALUE_DISPLAY
+
+
+@admin.register(RecipeRanking)
+class RecipeRankingClass(admin.ModelAdmin):
+    """Админка рейтингов рецептов."""
+
+    list_display = (
+        "recipe",
+        "score",
+        "favorites_count",
+        "cart_count",
+        "computed_at",
+    )
+    ordering = ("-score",)
+    empty_value_display = EMPTY_VALUE_DISPLAY
@@ -0,0 +1,149 @@
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.db import connections
+from PIL import Image, ImageOps
+
+from foodgram.settings import (
+    RECIPE_IMAGE_FORMATS,
+    RECIPE_IMAGE_QUALITY,
+    RECIPE_IMAGE_VARIANTS,
+    RECIPE_IMAGE_WORKERS,
+)
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+PIL_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    """Пул потоков для генерации превью, создаётся при первой задаче."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=RECIPE_IMAGE_WORKERS)
+    return _executor
+
+
+def get_image_storage():
+    """Хранилище изображений рецептов, в нём же лежат и превью."""
+    return Recipe._meta.get_field("image").storage
+
+
+def get_variant_name(image_name, size, file_format):
+    """Имя файла превью рядом с оригиналом: collect/variants/..."""
+    directory, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(
+        directory, "variants", f"{stem}_{size}.{file_format}"
+    )
+
+
+def get_variant_names(image_name):
+    """Имена всех превью изображения: {размер: {формат: имя}}."""
+    return {
+        size: {
+            file_format: get_variant_name(image_name, size, file_format)
+            for file_format in RECIPE_IMAGE_FORMATS
+        }
+        for size in RECIPE_IMAGE_VARIANTS
+    }
+
+
+def get_variant_urls(recipe):
+    """URL готовых превью рецепта или пустой словарь, пока их нет."""
+    image_name = recipe.image.name if recipe.image else ""
+    if not image_name or recipe.image_variants_of != image_name:
+        return {}
+    storage = get_image_storage()
+    return {
+        size: {
+            file_format: storage.url(name)
+            for file_format, name in names.items()
+        }
+        for size, names in get_variant_names(image_name).items()
+    }
+
+
+def render_variant(image, max_side, file_format):
+    variant = image.copy()
+    variant.thumbnail((max_side, max_side), Image.LANCZOS)
+    buffer = BytesIO()
+    options = {"quality": RECIPE_IMAGE_QUALITY}
+    if file_format == "jpeg":
+        options.update(optimize=True, progressive=True)
+    variant.save(buffer, PIL_FORMATS[file_format], **options)
+    return buffer.getvalue()
+
+
+def save_variant(name, content):
+    """Пишет превью во временный файл и переименовывает его поверх старого.
+
+    Пока файл пишется, по прежнему имени отдаётся старая версия.
+    """
+    storage = get_image_storage()
+    path = storage.path(name)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as file:
+        file.write(content)
+    if storage.file_permissions_mode is not None:
+        os.chmod(file.name, storage.file_permissions_mode)
+    os.replace(file.name, path)
+
+
+def generate_variants(recipe_id, image_name):
+    """Создаёт превью изображения и отмечает их готовность у рецепта.
+
+    Имена превью строятся по хешу оригинала, поэтому уже созданные
+    превью не пересчитываются. Отметка ставится, только если
+    изображение рецепта не сменилось за время генерации.
+    """
+    storage = get_image_storage()
+    names = get_variant_names(image_name)
+    missing = [
+        (size, file_format, name)
+        for size, formats in names.items()
+        for file_format, name in formats.items()
+        if not storage.exists(name)
+    ]
+    if missing:
+        with storage.open(image_name) as source:
+            image = ImageOps.exif_transpose(Image.open(source))
+            image = image.convert("RGB")
+        for size, file_format, name in missing:
+            save_variant(
+                name,
+                render_variant(
+                    image, RECIPE_IMAGE_VARIANTS[size], file_format
+                ),
+            )
+    return Recipe.objects.filter(id=recipe_id, image=image_name).update(
+        image_variants_of=image_name
+    )
+
+
+def run_generate_variants(recipe_id, image_name):
+    try:
+        generate_variants(recipe_id, image_name)
+    except Exception:
+        logger.exception(
+            "Не удалось создать превью изображения %s", image_name
+        )
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(recipe_id, image_name):
+    """Ставит генерацию превью в пул потоков."""
+    return get_executor().submit(
+        run_generate_variants, recipe_id, image_name
+    )
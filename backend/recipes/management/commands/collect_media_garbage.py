@@ -0,0 +1,87 @@
+import os
+from datetime import timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from foodgram.settings import MEDIA_GC_BATCH_SIZE, MEDIA_GC_GRACE_HOURS
+from recipes.images import get_image_storage, get_variant_names
+from recipes.models import Recipe
+
+
+def walk(storage, path):
+    """Все файлы хранилища внутри path, рекурсивно."""
+    if not storage.exists(path):
+        return
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield os.path.join(path, name)
+    for directory in directories:
+        yield from walk(storage, os.path.join(path, directory))
+
+
+def get_referenced_names():
+    """Имена изображений рецептов и их превью."""
+    referenced = set()
+    images = (
+        Recipe.objects.exclude(image="")
+        .exclude(image__isnull=True)
+        .values_list("image", flat=True)
+        .distinct()
+    )
+    for image_name in images.iterator():
+        referenced.add(image_name)
+        for names in get_variant_names(image_name).values():
+            referenced.update(names.values())
+    return referenced
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет файлы изображений рецептов, на которые не ссылается ни "
+        "один рецепт. Файлы моложе срока ожидания не удаляются, чтобы не "
+        "задеть загрузки, ещё не сохранённые в базе."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours", type=int, default=MEDIA_GC_GRACE_HOURS
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=MEDIA_GC_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать, сколько файлов будет удалено.",
+        )
+
+    def handle(self, *args, **options):
+        storage = get_image_storage()
+        upload_to = Recipe._meta.get_field("image").upload_to
+        cutoff = timezone.now() - timedelta(hours=options["grace_hours"])
+        referenced = get_referenced_names()
+        orphans = (
+            name
+            for name in walk(storage, upload_to.rstrip("/"))
+            if name not in referenced
+            and storage.get_modified_time(name) < cutoff
+        )
+        deleted = 0
+        while True:
+            batch = list(islice(orphans, options["batch_size"]))
+            if not batch:
+                break
+            # Повторная проверка: на файл могла появиться новая ссылка.
+            batch = set(batch) - set(
+                Recipe.objects.filter(image__in=batch).values_list(
+                    "image", flat=True
+                )
+            )
+            if not options["dry_run"]:
+                for name in batch:
+                    storage.delete(name)
+            deleted += len(batch)
+        action = "Будет удалено" if options["dry_run"] else "Удалено"
+        self.stdout.write(self.style.SUCCESS(f"{action} файлов: {deleted}."))
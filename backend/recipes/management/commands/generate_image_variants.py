@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from foodgram.settings import RECIPE_IMAGE_WORKERS
+from recipes.images import run_generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "Создаёт превью изображений рецептов, для которых их ещё нет "
+        "или которые устарели после смены изображения."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=RECIPE_IMAGE_WORKERS,
+            help="Число потоков генерации.",
+        )
+
+    def handle(self, *args, **options):
+        pending = list(
+            Recipe.objects.exclude(image="")
+            .exclude(image__isnull=True)
+            .exclude(image_variants_of=F("image"))
+            .values_list("id", "image")
+        )
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            for recipe_id, image_name in pending:
+                executor.submit(run_generate_variants, recipe_id, image_name)
+        recipe_ids = [recipe_id for recipe_id, _ in pending]
+        done = (
+            Recipe.objects.filter(id__in=recipe_ids)
+            .filter(image_variants_of=F("image"))
+            .count()
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создано превью для рецептов: {done} из {len(pending)}."
+            )
+        )
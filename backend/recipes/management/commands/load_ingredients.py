@@ -0,0 +1,161 @@
+import csv
+import io
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.fragments import recipe_fragments
+from api.reference import ingredients_cache, tags_cache
+from foodgram.settings import BASE_DIR
+from recipes.models import Ingredient, Tag
+
+DEFAULT_INGREDIENTS_PATH = os.path.join(BASE_DIR, "data", "ingredients.csv")
+DEFAULT_TAGS_PATH = os.path.join(BASE_DIR, "data", "tag.json")
+
+
+def read_csv(path):
+    """Строки CSV вида «название,единица измерения».
+
+    В исходном файле запятые внутри названий не экранированы, поэтому
+    единицей измерения считается последнее поле строки.
+    """
+    with open(path, encoding="utf-8", newline="") as csv_file:
+        for row in csv.reader(csv_file):
+            if len(row) == 1:
+                row = row[0].rsplit(",", 1)
+            if len(row) < 2:
+                continue
+            yield ",".join(row[:-1]), row[-1]
+
+
+def read_json(path):
+    with open(path, encoding="utf-8") as json_file:
+        for ingredient in json.load(json_file):
+            yield ingredient["name"], ingredient["measurement_unit"]
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает ингредиенты и тэги из data/. Повторный запуск не создаёт "
+        "дубликатов: существующие пары «название + единица» пропускаются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            default=DEFAULT_INGREDIENTS_PATH,
+            help="CSV или JSON файл с ингредиентами.",
+        )
+        parser.add_argument(
+            "--tags",
+            default=DEFAULT_TAGS_PATH,
+            help="JSON файл с тэгами.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Не использовать COPY даже на PostgreSQL.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if path.endswith(".csv"):
+            rows = read_csv(path)
+        elif path.endswith(".json"):
+            rows = read_json(path)
+        else:
+            raise CommandError("Поддерживаются только файлы .csv и .json.")
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            if connection.vendor == "postgresql" and not options["no_copy"]:
+                total, created = self.copy_ingredients(rows)
+            else:
+                total, created = self.bulk_create_ingredients(
+                    rows, options["batch_size"]
+                )
+            tags_created = self.load_tags(options["tags"])
+        elapsed = time.perf_counter() - started
+
+        ingredients_cache.bump_version()
+        tags_cache.bump_version()
+        recipe_fragments.bump_version()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Ингредиенты: прочитано {total}, добавлено {created}; "
+                f"тэгов добавлено {tags_created}. "
+                f"{elapsed:.2f} с, {total / elapsed:.0f} строк/с."
+            )
+        )
+
+    def bulk_create_ingredients(self, rows, batch_size):
+        existing = set(
+            Ingredient.objects.values_list("name", "measurement_unit")
+        )
+        total = created = 0
+        for batch in batches(rows, batch_size):
+            total += len(batch)
+            new = []
+            for row in batch:
+                if row not in existing:
+                    existing.add(row)
+                    new.append(
+                        Ingredient(name=row[0], measurement_unit=row[1])
+                    )
+            Ingredient.objects.bulk_create(new)
+            created += len(new)
+        return total, created
+
+    def copy_ingredients(self, rows):
+        """Загрузка через COPY во временную таблицу и один INSERT."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        total = 0
+        for row in rows:
+            writer.writerow(row)
+            total += 1
+        buffer.seek(0)
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS ingredient_load")
+            cursor.execute(
+                "CREATE TEMP TABLE ingredient_load "
+                "(name text, measurement_unit text) ON COMMIT DROP"
+            )
+            cursor.copy_expert(
+                "COPY ingredient_load (name, measurement_unit) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+            cursor.execute(
+                f"INSERT INTO {table} (name, measurement_unit) "
+                "SELECT DISTINCT name, measurement_unit FROM ingredient_load "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {table} i "
+                "WHERE i.name = ingredient_load.name "
+                "AND i.measurement_unit = ingredient_load.measurement_unit)"
+            )
+            created = cursor.rowcount
+        return total, created
+
+    def load_tags(self, path):
+        if not os.path.exists(path):
+            return 0
+        with open(path, encoding="utf-8") as json_file:
+            tags = json.load(json_file)
+        existing = set(Tag.objects.values_list("slug", flat=True))
+        new = [Tag(**tag) for tag in tags if tag["slug"] not in existing]
+        Tag.objects.bulk_create(new)
+        return len(new)
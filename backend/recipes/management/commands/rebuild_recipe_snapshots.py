@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.fragments import recipe_fragments
+from foodgram.settings import (
+    RECIPE_SNAPSHOT_BATCH_SIZE,
+    RECIPE_SNAPSHOT_WORKERS,
+)
+from recipes.models import Recipe
+from recipes.snapshots import rebuild_snapshots
+
+
+def rebuild_batch(recipe_ids):
+    try:
+        return len(rebuild_snapshots(recipe_ids))
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересобирает снимки всех рецептов. Пачки обрабатываются "
+        "параллельно, каждая в своей транзакции."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=RECIPE_SNAPSHOT_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--workers", type=int, default=RECIPE_SNAPSHOT_WORKERS
+        )
+
+    def handle(self, *args, **options):
+        size = options["batch_size"]
+        recipe_ids = list(
+            Recipe.objects.order_by("id").values_list("id", flat=True)
+        )
+        batches = [
+            recipe_ids[start:start + size]
+            for start in range(0, len(recipe_ids), size)
+        ]
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            total = sum(executor.map(rebuild_batch, batches))
+        recipe_fragments.bump_version()
+        self.stdout.write(
+            self.style.SUCCESS(f"Пересобрано снимков: {total}.")
+        )
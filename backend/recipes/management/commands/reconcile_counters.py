@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from recipes.models import Favorite, Recipe, ShoppingCart, count_subquery
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает счётчики favorites_count и cart_count рецептов "
+        "и исправляет расхождения с таблицами избранного и покупок."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drifted = list(
+                Recipe.objects.annotate(
+                    actual_favorites_count=count_subquery(Favorite),
+                    actual_cart_count=count_subquery(ShoppingCart),
+                )
+                .filter(
+                    ~Q(favorites_count=F("actual_favorites_count"))
+                    | ~Q(cart_count=F("actual_cart_count"))
+                )
+                .values_list("id", flat=True)
+            )
+            if drifted:
+                Recipe.objects.filter(id__in=drifted).update(
+                    favorites_count=count_subquery(Favorite),
+                    cart_count=count_subquery(ShoppingCart),
+                )
+        self.stdout.write(
+            self.style.SUCCESS(f"Исправлено рецептов: {len(drifted)}.")
+        )
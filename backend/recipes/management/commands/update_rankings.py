@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from recipes.rankings import update_rankings
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает рейтинги популярных рецептов. Обрабатывает только "
+        "рецепты с активностью после прошлого запуска; рассчитан на запуск "
+        "по расписанию (cron)."
+    )
+
+    def handle(self, *args, **options):
+        total = update_rankings()
+        self.stdout.write(
+            self.style.SUCCESS(f"Пересчитано рейтингов: {total}.")
+        )
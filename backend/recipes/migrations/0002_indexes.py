@@ -0,0 +1,31 @@
+# Generated by Django 3.0.14 on 2026-10-18 04:06
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ('author', 'id'), 'verbose_name': 'Рецепт', 'verbose_name_plural': 'Рецепты'},
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='slug',
+            field=models.TextField(blank=True, max_length=200, null=True, unique=True, validators=[django.core.validators.RegexValidator(message='Разрешены латинские буквы и цифры. Не более 200 символов', regex='^[-a-zA-Z0-9_]+$')], verbose_name='Уникальный слаг'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['name', 'measurement_unit'], name='ingredient_name_unit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', 'id'], name='recipe_author_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-18 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_rankings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants_of',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100, verbose_name='Изображение, для которого созданы превью'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.0.14 on 2026-10-18 04:21
+
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=recipes.storage.HashedFileSystemStorage(), upload_to='collect/', verbose_name='Изображение'),
+        ),
+    ]
@@ -1,8 +1,12 @@
+from django.contrib.postgres.fields import JSONField
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 from foodgram.settings import MIN_COOKING_TIME, TAG_SLUG_LENGTH_ERROR
 from users.models import User
+from .storage import HashedFileSystemStorage
 
 
 class Ingredient(models.Model):
@@ -14,6 +18,12 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
+        indexes = [
+            models.Index(
+                fields=["name", "measurement_unit"],
+                name="ingredient_name_unit_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Ингредиент - {self.name}"
@@ -37,6 +47,7 @@ class Tag(models.Model):
         ],
         blank=True,
         null=True,
+        unique=True,
     )
 
     class Meta:
@@ -55,10 +66,18 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name="Изображение",
         upload_to="collect/",
+        storage=HashedFileSystemStorage(),
         editable=True,
         blank=True,
         null=True,
     )
+    image_variants_of = models.CharField(
+        "Изображение, для которого созданы превью",
+        max_length=100,
+        blank=True,
+        default="",
+        editable=False,
+    )
     cooking_time = models.PositiveSmallIntegerField(
         "Время приготовления (в минутах)",
         # validators=[MinValueValidator(MIN_COOKING_TIME)],
@@ -81,19 +100,31 @@ class Recipe(models.Model):
     tags = models.ManyToManyField(
         Tag, verbose_name="Тэги", blank=True, null=True
     )
+    favorites_count = models.PositiveIntegerField(
+        "Добавлено в избранное", default=0, editable=False, db_index=True
+    )
+    cart_count = models.PositiveIntegerField(
+        "Добавлено в списки покупок", default=0, editable=False
+    )
 
     class Meta:
-        ordering = ("author",)
+        ordering = ("author", "id")
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
+        indexes = [
+            models.Index(
+                fields=["author", "id"], name="recipe_author_id_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"Рецепт - {self.name}"
 
     def _get_adding_to_favourite(self):
-        return self.favorites.count()
+        return self.favorites_count
 
     _get_adding_to_favourite.short_description = "добавлено в избранное"
+    _get_adding_to_favourite.admin_order_field = "favorites_count"
 
 
 class IngredientRecipe(models.Model):
@@ -144,9 +175,150 @@ class Follow(models.Model):
         ]
 
 
+def count_subquery(model):
+    """Число строк model для каждого рецепта внешнего запроса."""
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(recipe=models.OuterRef("pk"))
+            .values("recipe")
+            .annotate(total=models.Count("id"))
+            .values("total"),
+            output_field=models.IntegerField(),
+        ),
+        models.Value(0),
+    )
+
+
+class UserRecipeManager(models.Manager):
+    """Идемпотентное добавление и удаление связей пользователь-рецепт.
+
+    Каждая операция — один запрос к таблице связей, исход определяется
+    по числу затронутых строк, а не предварительной проверкой, поэтому
+    повторные клики не упираются в уникальное ограничение. Запросы идут
+    мимо сигналов моделей: счётчики рецептов меняются здесь же, а
+    сигналы поддерживают их при остальных изменениях (админка, каскадное
+    удаление).
+    """
+
+    def delete_links(self, user, recipe_ids):
+        """Удаляет связи без сигналов, возвращает число удалённых строк."""
+        ops = connection.ops
+        table = ops.quote_name(self.model._meta.db_table)
+        placeholders = ", ".join(["%s"] * len(recipe_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} "
+                f"WHERE user_id = %s AND recipe_id IN ({placeholders})",
+                [user.id, *recipe_ids],
+            )
+            return cursor.rowcount
+
+    def insert_links(self, user, recipe_ids):
+        """Вставляет связи без сигналов, возвращает id добавленных."""
+        ops = connection.ops
+        table = ops.quote_name(self.model._meta.db_table)
+        placeholders = ", ".join(["%s"] * len(recipe_ids))
+        sql = (
+            f"{ops.insert_statement(ignore_conflicts=True)} {table} "
+            "(user_id, recipe_id, created) "
+            f"SELECT %s, id, %s FROM {ops.quote_name(Recipe._meta.db_table)} "
+            f"WHERE id IN ({placeholders}) "
+            f"{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)} "
+            "RETURNING recipe_id"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                sql,
+                [
+                    user.id,
+                    ops.adapt_datetimefield_value(timezone.now()),
+                    *recipe_ids,
+                ],
+            )
+            return {recipe_id for recipe_id, in cursor.fetchall()}
+
+    def add(self, user, recipe):
+        """Добавляет рецепт, возвращает False, если он уже добавлен."""
+        ops = connection.ops
+        table = ops.quote_name(self.model._meta.db_table)
+        sql = (
+            f"{ops.insert_statement(ignore_conflicts=True)} {table} "
+            "(user_id, recipe_id, created) VALUES (%s, %s, %s) "
+            f"{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}"
+        )
+        counter = self.model.counter_field
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                sql,
+                [
+                    user.id,
+                    recipe.id,
+                    ops.adapt_datetimefield_value(timezone.now()),
+                ],
+            )
+            if cursor.rowcount != 1:
+                return False
+            Recipe.objects.filter(id=recipe.id).update(
+                **{counter: models.F(counter) + 1}
+            )
+        return True
+
+    def remove(self, user, recipe):
+        """Удаляет рецепт, возвращает False, если его не было."""
+        counter = self.model.counter_field
+        with transaction.atomic():
+            if not self.delete_links(user, [recipe.id]):
+                return False
+            Recipe.objects.filter(
+                id=recipe.id, **{f"{counter}__gt": 0}
+            ).update(**{counter: models.F(counter) - 1})
+        return True
+
+    def recount(self, recipe_ids):
+        """Пересчитывает счётчик рецептов по таблице связей."""
+        counter = self.model.counter_field
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            **{counter: count_subquery(self.model)}
+        )
+
+    def add_many(self, user, recipe_ids):
+        """Добавляет рецепты пачкой.
+
+        Возвращает словарь id рецепта -> добавлен ли он сейчас,
+        несуществующих рецептов в словаре нет. Добавленными считаются
+        строки, которые вернула сама вставка, поэтому параллельный запрос
+        не приводит к ложному статусу. Счётчики пересчитываются одним
+        запросом, поэтому не расходятся при параллельных запросах.
+        """
+        with transaction.atomic():
+            found = set(
+                Recipe.objects.filter(id__in=recipe_ids).values_list(
+                    "id", flat=True
+                )
+            )
+            added = self.insert_links(user, found) if found else set()
+            if added:
+                self.recount(added)
+        return {recipe_id: recipe_id in added for recipe_id in found}
+
+    def remove_many(self, user, recipe_ids):
+        """Удаляет рецепты пачкой, возвращает множество удалённых id."""
+        with transaction.atomic():
+            links = self.filter(user=user, recipe_id__in=recipe_ids)
+            removed = set(
+                links.select_for_update().values_list("recipe_id", flat=True)
+            )
+            if removed:
+                self.delete_links(user, list(removed))
+                self.recount(removed)
+        return removed
+
+
 class Favorite(models.Model):
     """Избранные рецепты"""
 
+    counter_field = "favorites_count"
+
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -155,6 +327,11 @@ class Favorite(models.Model):
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE, related_name="favorites"
     )
+    created = models.DateTimeField(
+        "Дата добавления", auto_now_add=True, db_index=True
+    )
+
+    objects = UserRecipeManager()
 
     class Meta:
         verbose_name = "Избранный рецепт"
@@ -170,6 +347,8 @@ class Favorite(models.Model):
 class ShoppingCart(models.Model):
     """Список покупок"""
 
+    counter_field = "cart_count"
+
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -178,6 +357,11 @@ class ShoppingCart(models.Model):
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE, related_name="cart"
     )
+    created = models.DateTimeField(
+        "Дата добавления", auto_now_add=True, db_index=True
+    )
+
+    objects = UserRecipeManager()
 
     class Meta:
         verbose_name = "Список покупок"
@@ -187,3 +371,60 @@ class ShoppingCart(models.Model):
                 fields=["user", "recipe"], name="user_shopping_cart_connection"
             )
         ]
+
+
+class RecipeRanking(models.Model):
+    """Рейтинг популярности рецепта с затуханием по времени.
+
+    score — log2 суммы весов добавлений в избранное и списки покупок,
+    где вес удваивается каждые RANKING_HALF_LIFE_DAYS от общей точки
+    отсчёта. Поэтому уже посчитанные рейтинги не устаревают и
+    пересчитывать нужно только рецепты с новой активностью.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="ranking",
+        verbose_name="Рецепт",
+    )
+    score = models.FloatField("Рейтинг", db_index=True)
+    favorites_count = models.PositiveIntegerField(default=0)
+    cart_count = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField("Дата расчёта", db_index=True)
+
+    class Meta:
+        ordering = ("-score",)
+        verbose_name = "Рейтинг рецепта"
+        verbose_name_plural = "Рейтинги рецептов"
+
+    def __str__(self):
+        return f"{self.recipe} - {self.score:.2f}"
+
+
+class RecipeSnapshot(models.Model):
+    """Готовый документ рецепта для чтения.
+
+    Содержит общую для всех пользователей часть представления рецепта
+    с автором, тэгами и ингредиентами. Пересобирается в той же
+    транзакции, что и изменение рецепта, поэтому чтение не делает
+    соединений со связанными таблицами.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="snapshot",
+        verbose_name="Рецепт",
+    )
+    document = JSONField("Документ")
+    built_at = models.DateTimeField("Дата сборки", auto_now=True)
+
+    class Meta:
+        verbose_name = "Снимок рецепта"
+        verbose_name_plural = "Снимки рецептов"
+
+    def __str__(self):
+        return f"Снимок - {self.recipe}"
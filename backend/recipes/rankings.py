@@ -0,0 +1,98 @@
+import math
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from foodgram.settings import (
+    RANKING_BATCH_SIZE,
+    RANKING_CART_WEIGHT,
+    RANKING_FAVORITE_WEIGHT,
+    RANKING_HALF_LIFE_DAYS,
+)
+from .models import Favorite, Recipe, RecipeRanking, ShoppingCart
+
+RANKING_EPOCH = datetime(2022, 1, 1, tzinfo=dt_timezone.utc)
+HALF_LIFE_SECONDS = RANKING_HALF_LIFE_DAYS * 24 * 60 * 60
+ACTIVITY_WEIGHTS = (
+    (Favorite, math.log2(RANKING_FAVORITE_WEIGHT)),
+    (ShoppingCart, math.log2(RANKING_CART_WEIGHT)),
+)
+
+
+def get_exponent(created, log_weight):
+    """log2 веса добавления: +1 за каждый период полураспада от эпохи."""
+    age = (created - RANKING_EPOCH).total_seconds()
+    return age / HALF_LIFE_SECONDS + log_weight
+
+
+def get_score(exponents):
+    """log2 суммы 2**exponent без переполнения для больших показателей."""
+    top = max(exponents)
+    return top + math.log2(sum(2 ** (value - top) for value in exponents))
+
+
+def get_changed_recipe_ids(since):
+    """Рецепты, рейтинг которых мог измениться после since.
+
+    Новые добавления видны по дате created, а удаления — по расхождению
+    счётчиков рецепта с сохранёнными в рейтинге.
+    """
+    changed = set()
+    for model, _ in ACTIVITY_WEIGHTS:
+        rows = model.objects.all()
+        if since is not None:
+            rows = rows.filter(created__gte=since)
+        changed.update(rows.values_list("recipe_id", flat=True).distinct())
+    changed.update(
+        RecipeRanking.objects.exclude(
+            favorites_count=F("recipe__favorites_count"),
+            cart_count=F("recipe__cart_count"),
+        ).values_list("recipe_id", flat=True)
+    )
+    return changed
+
+
+def rank_recipes(recipe_ids, computed_at):
+    exponents = {recipe_id: [] for recipe_id in recipe_ids}
+    for model, log_weight in ACTIVITY_WEIGHTS:
+        for recipe_id, created in model.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list("recipe_id", "created"):
+            exponents[recipe_id].append(get_exponent(created, log_weight))
+    counters = Recipe.objects.filter(id__in=recipe_ids).values_list(
+        "id", "favorites_count", "cart_count"
+    )
+    rankings = [
+        RecipeRanking(
+            recipe_id=recipe_id,
+            score=get_score(exponents[recipe_id]),
+            favorites_count=favorites_count,
+            cart_count=cart_count,
+            computed_at=computed_at,
+        )
+        for recipe_id, favorites_count, cart_count in counters
+        if exponents[recipe_id]
+    ]
+    with transaction.atomic():
+        RecipeRanking.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeRanking.objects.bulk_create(rankings)
+
+
+def update_rankings():
+    """Пересчитывает рейтинги рецептов с активностью после прошлого запуска.
+
+    Возвращает количество пересчитанных рецептов.
+    """
+    computed_at = timezone.now()
+    since = RecipeRanking.objects.aggregate(since=Max("computed_at"))["since"]
+    recipe_ids = iter(get_changed_recipe_ids(since))
+    total = 0
+    batch = list(islice(recipe_ids, RANKING_BATCH_SIZE))
+    while batch:
+        rank_recipes(batch, computed_at)
+        total += len(batch)
+        batch = list(islice(recipe_ids, RANKING_BATCH_SIZE))
+    return total
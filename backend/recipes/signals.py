@@ -0,0 +1,87 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from foodgram.settings import USER_FIELD_RESPONSE
+from users.models import User
+from .models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from .snapshots import rebuild_snapshots_in_batches
+
+# Рецепты, в снимки которых входят данные тэга или ингредиента.
+SNAPSHOT_DEPENDENCIES = {
+    Tag: lambda tag: Recipe.tags.through.objects.filter(tag_id=tag.id),
+    Ingredient: lambda ingredient: IngredientRecipe.objects.filter(
+        ingredient_id=ingredient.id
+    ),
+}
+
+
+@receiver(post_save, sender=User)
+def rebuild_author_snapshots(instance, update_fields=None, **kwargs):
+    """Пересобирает снимки рецептов при изменении данных автора."""
+    if update_fields is not None and not set(update_fields) & set(
+        USER_FIELD_RESPONSE
+    ):
+        return
+    rebuild_snapshots_in_batches(
+        Recipe.objects.filter(author=instance).values_list("id", flat=True)
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def rebuild_dependent_snapshots(sender, instance, created, **kwargs):
+    """Пересобирает снимки рецептов с изменённым тэгом или ингредиентом."""
+    if not created:
+        rebuild_snapshots_in_batches(
+            SNAPSHOT_DEPENDENCIES[sender](instance).values_list(
+                "recipe_id", flat=True
+            )
+        )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_dependent_snapshots(sender, instance, **kwargs):
+    # После удаления связи с рецептами уже не найти.
+    instance._snapshot_recipe_ids = list(
+        SNAPSHOT_DEPENDENCIES[sender](instance).values_list(
+            "recipe_id", flat=True
+        )
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def rebuild_deleted_dependent_snapshots(instance, **kwargs):
+    rebuild_snapshots_in_batches(
+        getattr(instance, "_snapshot_recipe_ids", ())
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    """Счётчик рецепта для связей, созданных мимо UserRecipeManager."""
+    if created:
+        counter = sender.counter_field
+        Recipe.objects.filter(id=instance.recipe_id).update(
+            **{counter: F(counter) + 1}
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    """Счётчик рецепта для связей, удалённых мимо UserRecipeManager."""
+    counter = sender.counter_field
+    Recipe.objects.filter(
+        id=instance.recipe_id, **{f"{counter}__gt": 0}
+    ).update(**{counter: F(counter) - 1})
@@ -0,0 +1,74 @@
+from django.db import transaction
+from django.db.models import Prefetch
+
+from foodgram.settings import RECIPE_SNAPSHOT_BATCH_SIZE, USER_FIELD_RESPONSE
+from .models import IngredientRecipe, Recipe, RecipeSnapshot
+
+
+def get_ingredients_prefetch():
+    return Prefetch(
+        "ingredient_recipe",
+        queryset=IngredientRecipe.objects.select_related("ingredient"),
+    )
+
+
+def build_document(recipe):
+    """Одинаковая для всех пользователей часть представления рецепта.
+
+    Ожидает рецепт с загруженными автором, тэгами и ингредиентами,
+    иначе каждая связь потребует отдельного запроса.
+    """
+    return {
+        "author": {
+            field: getattr(recipe.author, field)
+            for field in USER_FIELD_RESPONSE
+        },
+        "id": recipe.id,
+        "ingredients": [
+            {
+                "id": row.ingredient.id,
+                "name": row.ingredient.name,
+                "measurement_unit": row.ingredient.measurement_unit,
+                "amount": row.amount,
+            }
+            for row in recipe.ingredient_recipe.all()
+        ],
+        "name": recipe.name,
+        "cooking_time": recipe.cooking_time,
+        "tags": [
+            {
+                "id": tag.id,
+                "name": tag.name,
+                "color": tag.color,
+                "slug": tag.slug,
+            }
+            for tag in recipe.tags.all()
+        ],
+        "text": recipe.text,
+    }
+
+
+def rebuild_snapshots(recipe_ids):
+    """Пересобирает снимки рецептов, возвращает {id рецепта: документ}."""
+    recipes = (
+        Recipe.objects.filter(id__in=recipe_ids)
+        .select_related("author")
+        .prefetch_related("tags", get_ingredients_prefetch())
+    )
+    documents = {recipe.id: build_document(recipe) for recipe in recipes}
+    with transaction.atomic():
+        RecipeSnapshot.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeSnapshot.objects.bulk_create(
+            RecipeSnapshot(recipe_id=recipe_id, document=document)
+            for recipe_id, document in documents.items()
+        )
+    return documents
+
+
+def rebuild_snapshots_in_batches(recipe_ids):
+    """Пересобирает снимки пачками по RECIPE_SNAPSHOT_BATCH_SIZE."""
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), RECIPE_SNAPSHOT_BATCH_SIZE):
+        rebuild_snapshots(
+            recipe_ids[start:start + RECIPE_SNAPSHOT_BATCH_SIZE]
+        )
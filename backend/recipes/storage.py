@@ -0,0 +1,40 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class HashedFileSystemStorage(FileSystemStorage):
+    """Хранилище, где имя файла — sha256 его содержимого.
+
+    Одинаковые загрузки сохраняются один раз: повторная отдаёт имя уже
+    лежащего файла. Файлы не удаляются вместе с рецептами, ссылки на них
+    считаются по базе командой collect_media_garbage.
+    """
+
+    def get_hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        hexdigest = digest.hexdigest()
+        return os.path.join(
+            directory, hexdigest[:2], f"{hexdigest}{extension}"
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            return super().save(name, content, max_length)
+        name = self.get_hashed_name(name, content)
+        if self.exists(name):
+            # Обновляем время изменения, чтобы сборщик мусора не удалил
+            # файл, на который только что появилась новая ссылка.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)